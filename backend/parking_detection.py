@@ -11,12 +11,15 @@ import os
 import pickle
 import asyncio
 import json
+import threading
+import uuid
+from collections import OrderedDict
 from datetime import datetime
 from typing import List, Dict, Any
 from sklearn.ensemble import RandomForestClassifier
 
 class ParkingDetectionSystem:
-    def __init__(self):
+    def __init__(self, alert_ttl_seconds=10, max_alerts_per_camera=50, feature_cache_size=256):
         # Load the YOLO model
         self.yolo_model = YOLO("yolov8n.pt")
         
@@ -50,11 +53,20 @@ class ParkingDetectionSystem:
             transforms.ToTensor()
         ])
         
-        # Vehicle tracker
-        self.tracker = VehicleTracker(iou_threshold=0.3)
+        # Vehicle trackers, one per camera so track ids never collide
+        self.trackers = {}
+        self.camera_locks = {}
+        self.camera_locks_lock = threading.Lock()
         
-        # Persistent alerts
-        self.persistent_alerts = {}
+        # Configured no-parking polygons per camera, replaces the frame classifier
+        self.zone_masks = {}
+        
+        # Violation alerts, expired once their vehicle's track has ended
+        self.alert_store = AlertStore(ttl_seconds=alert_ttl_seconds,
+                                      max_alerts_per_camera=max_alerts_per_camera)
+        
+        # Features and zone predictions of recently seen frames, keyed by perceptual hash
+        self.feature_cache = FeatureCache(max_entries=feature_cache_size)
         
         # Load or create classifier model
         self.classifier_model = self._load_or_create_model()
@@ -111,71 +123,98 @@ class ParkingDetectionSystem:
             print(f"Error initializing model: {e}")
             return None
     
-    def extract_features_from_frame(self, frame):
-        """Extract features from a video frame"""
-        try:
-            # YOLO detection
-            results = self.yolo_model(frame)
-            detected_objects = [self.yolo_model.names[int(box.cls)] for box in results[0].boxes]
+    def _compute_features(self, frame):
+        """Extract features from a video frame, raising on failure"""
+        # YOLO detection
+        results = self.yolo_model(frame)
+        detected_objects = [self.yolo_model.names[int(box.cls)] for box in results[0].boxes]
 
-            parking_score = 0
-            for obj in detected_objects:
-                parking_score += self.object_weights.get(obj, 0)
+        parking_score = 0
+        for obj in detected_objects:
+            parking_score += self.object_weights.get(obj, 0)
 
-            # Feature Engineering
-            img_area = frame.shape[0] * frame.shape[1]
+        # Feature Engineering
+        img_area = frame.shape[0] * frame.shape[1]
 
-            vehicle_area = 0
-            for box in results[0].boxes:
-                if self.yolo_model.names[int(box.cls)] in ['car', 'motorcycle', 'bus', 'truck', 'bicycle']:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    vehicle_area += (x2 - x1) * (y2 - y1)
+        vehicle_area = 0
+        for box in results[0].boxes:
+            if self.yolo_model.names[int(box.cls)] in ['car', 'motorcycle', 'bus', 'truck', 'bicycle']:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                vehicle_area += (x2 - x1) * (y2 - y1)
 
-            area_ratio = vehicle_area / img_area if img_area > 0 else 0
-            object_density = len(detected_objects) / img_area if img_area > 0 else 0
+        area_ratio = vehicle_area / img_area if img_area > 0 else 0
+        object_density = len(detected_objects) / img_area if img_area > 0 else 0
 
-            # Color Features
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            mean_hue = np.mean(hsv[:, :, 0])
-            mean_saturation = np.mean(hsv[:, :, 1])
-            mean_value = np.mean(hsv[:, :, 2])
+        # Color Features
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        mean_hue = np.mean(hsv[:, :, 0])
+        mean_saturation = np.mean(hsv[:, :, 1])
+        mean_value = np.mean(hsv[:, :, 2])
 
-            # CNN Deep Feature Extraction
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image_pil = Image.fromarray(rgb_frame)
-            image_tensor = self.transform(image_pil).unsqueeze(0).to(self.device)
-            
-            with torch.no_grad():
-                cnn_features = self.cnn_model(image_tensor).cpu().numpy().flatten()
+        # CNN Deep Feature Extraction
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image_pil = Image.fromarray(rgb_frame)
+        image_tensor = self.transform(image_pil).unsqueeze(0).to(self.device)
+        
+        with torch.no_grad():
+            cnn_features = self.cnn_model(image_tensor).cpu().numpy().flatten()
 
-            return [parking_score, area_ratio, object_density, mean_hue, mean_saturation, mean_value] + list(cnn_features)
+        return [parking_score, area_ratio, object_density, mean_hue, mean_saturation, mean_value] + list(cnn_features)
+    
+    def extract_features_from_frame(self, frame, camera=None):
+        """Extract features from a video frame, cached per camera when camera is given"""
+        key = None
+        try:
+            if camera is not None:
+                key = (camera, frame_hash(frame))
+                cached = self.feature_cache.get(key, 'features')
+                if cached is not None:
+                    return cached['features']
+            
+            features = self._compute_features(frame)
         except Exception as e:
             print(f"Error extracting features: {e}")
             return [0] * 12  # Return default features
+        
+        if key is not None:
+            self.feature_cache.put(key, {'features': features})
+        return features
     
-    def predict_from_frame(self, frame):
-        """Predict parking zone from a frame"""
+    def predict_from_frame(self, frame, camera=None):
+        """Predict parking zone from a frame, cached per camera when camera is given"""
+        key = None
         try:
+            cached = None
+            if camera is not None:
+                key = (camera, frame_hash(frame))
+                cached = self.feature_cache.get(key, 'prediction')
+                if cached is not None and 'prediction' in cached:
+                    return cached['prediction']
+            
+            # A partial entry still saves the feature extraction
+            features = cached['features'] if cached is not None else self._compute_features(frame)
+            
             if self.classifier_model is None:
                 # Fallback prediction based on parking score
-                features = self.extract_features_from_frame(frame)
                 parking_score = features[0]
-                return "Parking Zone" if parking_score > 0 else "No Parking Zone"
-            
-            features = self.extract_features_from_frame(frame)
-            
-            # Create DataFrame with features
-            column_names = ['parking_score', 'area_ratio', 'object_density', 'mean_hue', 
-                           'mean_saturation', 'mean_value'] + [f'cnn_feature_{i}' for i in range(6)]
-            
-            input_data = pd.DataFrame([features], columns=column_names)
-            
-            # Make prediction
-            prediction = self.classifier_model.predict(input_data)[0]
-            return "Parking Zone" if prediction == 0 else "No Parking Zone"
+                prediction = "Parking Zone" if parking_score > 0 else "No Parking Zone"
+            else:
+                # Create DataFrame with features
+                column_names = ['parking_score', 'area_ratio', 'object_density', 'mean_hue', 
+                               'mean_saturation', 'mean_value'] + [f'cnn_feature_{i}' for i in range(6)]
+                
+                input_data = pd.DataFrame([features], columns=column_names)
+                
+                # Make prediction
+                label = self.classifier_model.predict(input_data)[0]
+                prediction = "Parking Zone" if label == 0 else "No Parking Zone"
         except Exception as e:
             print(f"Error in prediction: {e}")
             return "Unknown Zone"
+        
+        if key is not None:
+            self.feature_cache.put(key, {'features': features, 'prediction': prediction})
+        return prediction
     
     def get_vehicle_detections(self, frame):
         """Get vehicle detections from frame"""
@@ -197,43 +236,78 @@ class ParkingDetectionSystem:
         
         return vehicles
     
-    def process_frame(self, frame, alert_threshold_seconds=5):
-        """Process a single frame and return detection results"""
+    def get_tracker(self, camera):
+        """Get the vehicle tracker for a camera, creating it on first use"""
+        if camera not in self.trackers:
+            self.trackers[camera] = VehicleTracker(iou_threshold=0.3)
+        return self.trackers[camera]
+    
+    def set_no_parking_zones(self, camera, polygons):
+        """Configure no-parking polygons (normalized [x, y] vertices) for a camera"""
+        if polygons:
+            self.zone_masks[camera] = ZoneMask(polygons)
+        else:
+            self.zone_masks.pop(camera, None)
+    
+    def get_camera_lock(self, camera):
+        """Lock serializing frames of one camera, its tracker and alerts are not thread-safe"""
+        with self.camera_locks_lock:
+            if camera not in self.camera_locks:
+                self.camera_locks[camera] = threading.Lock()
+            return self.camera_locks[camera]
+    
+    def process_frame(self, frame, alert_threshold_seconds=5, camera="default"):
+        """Process a single frame and return detection results.
+
+        Safe to call from several threads; frames of the same camera are
+        processed one at a time.
+        """
+        with self.get_camera_lock(camera):
+            return self._process_frame(frame, alert_threshold_seconds, camera)
+    
+    def _process_frame(self, frame, alert_threshold_seconds, camera):
         current_time = time.time()
         
-        # Predict zone
-        prediction = self.predict_from_frame(frame)
-        
         # Get vehicle detections
         vehicles = self.get_vehicle_detections(frame)
         vehicle_boxes = [v['bbox'] for v in vehicles]
+        tracker = self.get_tracker(camera)
         
-        # Update vehicle tracking
-        is_no_parking_zone = (prediction == "No Parking Zone")
-        tracked_vehicles = self.tracker.update(vehicle_boxes, current_time, is_no_parking_zone)
+        zone_mask = self.zone_masks.get(camera)
+        if zone_mask is not None:
+            # Per-vehicle zone decision from the camera's polygons, no model pass needed
+            in_zone = zone_mask.contains(vehicle_boxes, frame.shape)
+            prediction = "No Parking Zone" if in_zone.any() else "Parking Zone"
+            tracked_vehicles = tracker.update(vehicle_boxes, current_time, in_zone)
+            tracked_in_zone = zone_mask.contains([v[0] for v in tracked_vehicles], frame.shape).tolist()
+        else:
+            # Predict zone for the whole frame
+            prediction = self.predict_from_frame(frame, camera=camera)
+            is_no_parking_zone = (prediction == "No Parking Zone")
+            tracked_vehicles = tracker.update(vehicle_boxes, current_time, is_no_parking_zone)
+            tracked_in_zone = [is_no_parking_zone] * len(tracked_vehicles)
         
         # Process alerts
         alerts = []
-        for vehicle_box, vehicle_id, first_detection_time, continuous_detection_time in tracked_vehicles:
-            if is_no_parking_zone and continuous_detection_time > alert_threshold_seconds:
-                if vehicle_id not in self.persistent_alerts:
-                    alert_text = f"VIOLATION: Vehicle #{vehicle_id} in no-parking zone for {continuous_detection_time:.1f}s"
-                    self.persistent_alerts[vehicle_id] = {
-                        'text': alert_text,
-                        'bbox': vehicle_box,
-                        'timestamp': current_time,
-                        'duration': continuous_detection_time
-                    }
-                    alerts.append(self.persistent_alerts[vehicle_id])
-                else:
-                    # Update existing alert
-                    self.persistent_alerts[vehicle_id]['duration'] = continuous_detection_time
+        for i, (vehicle_box, vehicle_id, first_detection_time, continuous_detection_time) in enumerate(tracked_vehicles):
+            if tracked_in_zone[i] and continuous_detection_time > alert_threshold_seconds:
+                alert, is_new = self.alert_store.upsert(camera, vehicle_id, vehicle_box,
+                                                        continuous_detection_time, current_time)
+                if is_new:
+                    alerts.append(alert)
+        
+        # End alerts of tracks the tracker has dropped or aged out
+        ended_tracks = tracker.pop_ended_tracks()
+        seen_ids = {vehicle_id for _, vehicle_id, _, _ in tracked_vehicles}
+        self.alert_store.update(camera, seen_ids, {track['id'] for track in ended_tracks}, current_time)
         
-        # Prepare response
+        # Prepare response, only alerts of vehicles whose tracks are alive are returned
         response = {
             'prediction': prediction,
             'vehicles': [],
-            'alerts': list(self.persistent_alerts.values()),
+            'alerts': self.alert_store.active(camera),
+            'new_alerts': alerts,
+            'ended_tracks': ended_tracks,
             'timestamp': current_time
         }
         
@@ -247,14 +321,237 @@ class ParkingDetectionSystem:
                 'class': vehicle_data['class'],
                 'confidence': vehicle_data['confidence'],
                 'duration': continuous_detection_time,
-                'status': 'violation' if (is_no_parking_zone and continuous_detection_time > alert_threshold_seconds) else 'normal'
+                'in_no_parking_zone': tracked_in_zone[i],
+                'status': 'violation' if (tracked_in_zone[i] and continuous_detection_time > alert_threshold_seconds) else 'normal'
             })
         
         return response
     
+    def pop_expired_alerts(self):
+        """Return and forget alerts that expired since the last call"""
+        return self.alert_store.pop_expired()
+    
     def reset_alerts(self):
-        """Reset all persistent alerts"""
-        self.persistent_alerts.clear()
+        """Reset all alerts and violation timers, returns the alerts whose episodes were cut short"""
+        for camera in list(self.trackers):
+            with self.get_camera_lock(camera):
+                # Restart timers so a vehicle still in the zone starts a new episode
+                for vehicle in self.trackers[camera].tracked_vehicles:
+                    vehicle[3] = 0
+        return self.alert_store.drain()
+
+
+def frame_hash(frame, hash_size=8):
+    """64-bit difference hash of a downscaled grayscale frame, stable across near-identical frames"""
+    small = cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class FeatureCache:
+    """Thread-safe LRU cache of per-frame features, with hit-rate counters per camera.
+
+    A lookup is a hit when the entry holds the requested field, a partial hit
+    when the entry exists without it (e.g. features but no prediction yet),
+    and a miss otherwise. Only full hits count towards ``hit_rate``.
+    """
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (camera, frame hash) -> {'features', 'prediction'}
+        self.counters = {}  # camera -> {'hits', 'partial_hits', 'misses'}
+        self.lock = threading.Lock()
+    
+    def get(self, key, field):
+        """Entry for key (possibly without field), None on a miss"""
+        with self.lock:
+            counters = self.counters.setdefault(key[0], {'hits': 0, 'partial_hits': 0, 'misses': 0})
+            entry = self.entries.get(key)
+            if entry is None:
+                counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            counters['hits' if field in entry else 'partial_hits'] += 1
+            return entry
+    
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    @staticmethod
+    def _with_hit_rate(counters):
+        lookups = counters['hits'] + counters['partial_hits'] + counters['misses']
+        return dict(counters, hit_rate=counters['hits'] / lookups if lookups else 0.0)
+    
+    def stats(self):
+        with self.lock:
+            totals = {'hits': 0, 'partial_hits': 0, 'misses': 0}
+            for counters in self.counters.values():
+                for name, value in counters.items():
+                    totals[name] += value
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                **self._with_hit_rate(totals),
+                'cameras': {camera: self._with_hit_rate(counters) for camera, counters in self.counters.items()}
+            }
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+
+class ZoneMask:
+    """No-parking polygons of one camera, rasterized once per frame resolution.
+
+    Polygons use normalized [x, y] vertices (0..1) so the same configuration
+    works at any resolution. Each resolution's mask is kept as a summed-area
+    table, which makes the coverage of any box an O(1) lookup.
+    """
+    
+    def __init__(self, polygons, footprint_ratio=0.25, min_coverage=0.5):
+        self.polygons = [np.asarray(polygon, dtype=np.float32) for polygon in polygons]
+        self.footprint_ratio = footprint_ratio  # bottom share of the box touching the ground
+        self.min_coverage = min_coverage
+        self.integrals = {}  # (height, width) -> summed-area table of the mask
+    
+    def get_integral(self, height, width):
+        if (height, width) not in self.integrals:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            scale = np.array([width, height], dtype=np.float32)
+            cv2.fillPoly(mask, [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons], 1)
+            self.integrals[(height, width)] = cv2.integral(mask)
+        return self.integrals[(height, width)]
+    
+    def contains(self, boxes, frame_shape):
+        """Boolean array, True where a box's ground footprint lies in a no-parking zone"""
+        if len(boxes) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        height, width = frame_shape[:2]
+        integral = self.get_integral(height, width)
+        
+        # Clip to the frame first, the footprint is the bottom of the visible box
+        boxes = np.asarray(boxes, dtype=np.int64)
+        x1 = np.clip(boxes[:, 0], 0, width)
+        x2 = np.clip(boxes[:, 2], 0, width)
+        top = np.clip(boxes[:, 1], 0, height)
+        y2 = np.clip(boxes[:, 3], 0, height)
+        y1 = y2 - np.ceil(np.maximum(y2 - top, 0) * self.footprint_ratio).astype(np.int64)
+        
+        inside = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        area = (x2 - x1) * (y2 - y1)
+        coverage = np.where(area > 0, inside / np.maximum(area, 1), 0.0)
+        return coverage >= self.min_coverage
+
+
+def violation_key(camera, vehicle_id, started_at):
+    """Deterministic violation id for one track's episode, so repeated writes are idempotent"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"parking-violation/{camera}/{vehicle_id}/{started_at:.3f}"))
+
+
+class AlertStore:
+    """Bounded per-camera store of violation alerts, safe to share between threads.
+
+    An alert stays active until the tracker reports its track as ended, then
+    expires ``ttl_seconds`` after the vehicle was last seen. When a camera
+    holds ``max_alerts_per_camera`` alerts the oldest ended one is evicted to
+    make room; live alerts are never evicted, a new violation is held back
+    until a slot frees up. Expired and evicted alerts are queued until
+    collected with ``pop_expired``.
+    """
+    
+    def __init__(self, ttl_seconds=10, max_alerts_per_camera=50):
+        self.ttl_seconds = ttl_seconds
+        self.max_alerts_per_camera = max_alerts_per_camera
+        self.alerts = {}  # camera -> OrderedDict(vehicle_id -> alert), least recently seen first
+        self.expired = []
+        self.lock = threading.Lock()
+    
+    def upsert(self, camera, vehicle_id, bbox, duration, current_time):
+        """Raise a new alert or update an existing one, returns (alert, is_new).
+        alert is None when the camera is full of live alerts."""
+        with self.lock:
+            camera_alerts = self.alerts.setdefault(camera, OrderedDict())
+            
+            if vehicle_id in camera_alerts:
+                alert = camera_alerts[vehicle_id]
+                alert['bbox'] = bbox
+                self._touch(alert, current_time)
+                camera_alerts.move_to_end(vehicle_id)
+                return alert, False
+            
+            if len(camera_alerts) >= self.max_alerts_per_camera:
+                ended_ids = [key for key, existing in camera_alerts.items() if existing['ended']]
+                if not ended_ids:
+                    # Every slot holds a live episode, evicting one would only re-raise
+                    # it with a new id on the next frame, so hold this one back instead
+                    return None, False
+                self.expired.append(camera_alerts.pop(ended_ids[0]))
+            
+            alert = {
+                'id': violation_key(camera, vehicle_id, current_time),
+                'text': f"VIOLATION: Vehicle #{vehicle_id} in no-parking zone for {duration:.1f}s",
+                'vehicle_id': vehicle_id,
+                'camera': camera,
+                'bbox': bbox,
+                'timestamp': current_time,
+                'last_seen': current_time,
+                'duration': duration,
+                'ended': False
+            }
+            camera_alerts[vehicle_id] = alert
+            return alert, True
+    
+    @staticmethod
+    def _touch(alert, current_time):
+        # The episode lasts from its start until last seen, missed detections included:
+        # the tracker's timer restarts after a gap and must not shorten it
+        alert['duration'] += current_time - alert['last_seen']
+        alert['last_seen'] = current_time
+    
+    def update(self, camera, seen_ids, ended_ids, current_time):
+        """Refresh alerts of vehicles seen in this frame, end those whose tracks ended
+        and expire ended alerts not seen for ttl_seconds"""
+        with self.lock:
+            camera_alerts = self.alerts.get(camera)
+            if not camera_alerts:
+                return
+            
+            for vehicle_id, alert in list(camera_alerts.items()):
+                if vehicle_id in seen_ids:
+                    self._touch(alert, current_time)
+                if vehicle_id in ended_ids:
+                    alert['ended'] = True
+                if alert['ended'] and current_time - alert['last_seen'] >= self.ttl_seconds:
+                    self.expired.append(camera_alerts.pop(vehicle_id))
+    
+    def active(self, camera):
+        """Alerts of a camera whose tracks have not ended"""
+        with self.lock:
+            camera_alerts = self.alerts.get(camera, {})
+            return [alert for alert in camera_alerts.values() if not alert['ended']]
+    
+    def pop_expired(self):
+        with self.lock:
+            expired, self.expired = self.expired, []
+            return expired
+    
+    def drain(self):
+        """End and remove every alert, returns them together with the queued expired ones"""
+        with self.lock:
+            drained, self.expired = self.expired, []
+            for camera_alerts in self.alerts.values():
+                for alert in camera_alerts.values():
+                    alert['ended'] = True
+                    drained.append(alert)
+            self.alerts.clear()
+            return drained
 
 
 def calculate_iou(box1, box2):
@@ -276,16 +573,39 @@ def calculate_iou(box1, box2):
 
 
 class VehicleTracker:
-    def __init__(self, iou_threshold=0.5):
+    def __init__(self, iou_threshold=0.5, max_missed_seconds=30):
         self.tracked_vehicles = []
         self.next_id = 0
         self.iou_threshold = iou_threshold
+        self.max_missed_seconds = max_missed_seconds  # end tracks not matched for longer than this
+        self.first_seen = {}  # vehicle_id -> time the track started
+        self.in_zone = {}  # vehicle_id -> zone flag of the track's last matched box
+        self.ended_tracks = []  # finished tracks since the last pop_ended_tracks
     
     def update(self, current_boxes, current_time, is_no_parking_zone):
+        # is_no_parking_zone is either one flag for the whole frame or one flag per box
+        per_box = np.ndim(is_no_parking_zone) != 0
+        if per_box:
+            zone_flags = [bool(flag) for flag in is_no_parking_zone]
+        else:
+            zone_flags = [bool(is_no_parking_zone)] * len(current_boxes)
+        
         if not current_boxes:
+            # Reset timers of vehicles in a no-parking zone: the frame's zone, or
+            # with per-box flags the zone each vehicle was last seen in
             for vehicle in self.tracked_vehicles:
-                if is_no_parking_zone:
+                if self.in_zone.get(vehicle[1]) if per_box else is_no_parking_zone:
                     vehicle[3] = 0
+            
+            # A frame without detections keeps tracks alive through missed detections,
+            # but a track missing for max_missed_seconds has left the scene
+            kept_vehicles = []
+            for vehicle in self.tracked_vehicles:
+                if current_time - vehicle[2] > self.max_missed_seconds:
+                    self._end_track(vehicle[1], vehicle[2])
+                else:
+                    kept_vehicles.append(vehicle)
+            self.tracked_vehicles = kept_vehicles
             return []
         
         updated_vehicles = []
@@ -309,8 +629,9 @@ class VehicleTracker:
             if best_match_idx >= 0:
                 matched_indices.add(best_match_idx)
                 updated_box = current_boxes[best_match_idx]
+                self.in_zone[vehicle_id] = zone_flags[best_match_idx]
                 
-                if is_no_parking_zone:
+                if zone_flags[best_match_idx]:
                     continuous_detection_time += current_time - first_detection_time
                     first_detection_time = current_time
                 else:
@@ -318,13 +639,28 @@ class VehicleTracker:
                     first_detection_time = current_time
                 
                 updated_vehicles.append([updated_box, vehicle_id, first_detection_time, continuous_detection_time])
+            else:
+                # first_detection_time holds the last time this track was matched
+                self._end_track(vehicle_id, first_detection_time)
         
         for j, current_box in enumerate(current_boxes):
             if j not in matched_indices:
                 vehicle_id = self.next_id
                 self.next_id += 1
+                self.first_seen[vehicle_id] = current_time
+                self.in_zone[vehicle_id] = zone_flags[j]
                 continuous_detection_time = 0
                 updated_vehicles.append([current_box, vehicle_id, current_time, continuous_detection_time])
         
         self.tracked_vehicles = updated_vehicles
-        return self.tracked_vehicles
\ No newline at end of file
+        return self.tracked_vehicles
+    
+    def _end_track(self, vehicle_id, last_matched):
+        started = self.first_seen.pop(vehicle_id, last_matched)
+        self.in_zone.pop(vehicle_id, None)
+        self.ended_tracks.append({'id': vehicle_id, 'dwell': last_matched - started})
+    
+    def pop_ended_tracks(self):
+        """Return and forget tracks that ended since the last call, with their dwell time"""
+        ended, self.ended_tracks = self.ended_tracks, []
+        return ended
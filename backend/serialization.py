@@ -0,0 +1,35 @@
+import orjson
+from starlette.responses import JSONResponse
+
+# Non-string dict keys (track ids) and NumPy arrays/scalars are encoded natively
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(obj):
+    """Fallback for types orjson does not know, e.g. Mongo ObjectIds and sets"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'item'):
+        # NumPy scalar types orjson does not cover (e.g. float16)
+        return obj.item()
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    return str(obj)
+
+
+def dumps(obj) -> bytes:
+    """Serialize detection payloads, datetimes and Mongo documents to JSON bytes"""
+    return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Returning an instance directly from an endpoint skips FastAPI's
+    jsonable_encoder and response_model validation, which is what the
+    hot list endpoints want for documents that are already trusted.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
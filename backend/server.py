@@ -1,36 +1,25 @@
-from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Request, Query
 from fastapi.responses import StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorClient
+from serialization import FastJSONResponse, dumps
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 import json
-import cv2
+import base64
 import asyncio
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uuid
 
-# Try to import parking detection, fallback to mock for local development
-try:
-    from parking_detection import ParkingDetectionSystem
-    PARKING_DETECTION_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Parking detection not available ({e}). Using mock detection for local development.")
-    PARKING_DETECTION_AVAILABLE = False
-    
-    # Mock parking detection system for local development
-    class MockParkingDetectionSystem:
-        def reset_alerts(self):
-            return True
-    
-    ParkingDetectionSystem = MockParkingDetectionSystem
-
 ROOT_DIR = Path(__file__).parent
 
 # Load environment file - prefer .env.local for local development
@@ -41,19 +30,40 @@ else:
     load_dotenv(ROOT_DIR / '.env')
     print("Loaded .env for production")
 
+# API-only replicas serve violations, videos and the WebSocket relay without
+# ever importing OpenCV, torch or the detection models
+API_ONLY = os.environ.get('API_ONLY', '').lower() in ('1', 'true', 'yes')
+
+# Build the detection system in the background at startup, or on first use when disabled
+PRELOAD_DETECTION = os.environ.get('PRELOAD_DETECTION', 'true').lower() in ('1', 'true', 'yes')
+
+# Mock parking detection system for local development and API-only mode
+class MockParkingDetectionSystem:
+    def reset_alerts(self):
+        return []
+    
+    def pop_expired_alerts(self):
+        return []
+    
+    def set_no_parking_zones(self, camera, polygons):
+        return True
+
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'parking_db')]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Initialize parking detection system
-parking_system = ParkingDetectionSystem()
+# Parking detection system, constructed lazily by load_parking_system()
+parking_system = None
+PARKING_DETECTION_AVAILABLE = False
+detection_status = "disabled" if API_ONLY else "pending"
+detection_task = None
 
 # Create videos directory if it doesn't exist
 videos_dir = ROOT_DIR / "videos"
@@ -71,6 +81,66 @@ AVAILABLE_VIDEOS = {
     "Sigma Block": "videos/sigmablock.mp4"
 }
 
+# Cameras /process-frame accepts, each keeps its own tracker and alerts. EXTRA_CAMERAS
+# adds comma-separated names without a video, e.g. "Load Test" for the load harness.
+FRAME_CAMERAS = set(AVAILABLE_VIDEOS) | {
+    name.strip() for name in os.environ.get('EXTRA_CAMERAS', '').split(',') if name.strip()
+}
+
+# No-parking polygons per video, as lists of normalized [x, y] vertices (0..1).
+# Cameras with polygons get per-vehicle zone checks instead of the frame classifier.
+NO_PARKING_ZONES: Dict[str, List[List[List[float]]]] = {}
+
+zones_file = ROOT_DIR / os.environ.get('ZONES_FILE', 'zones.json')
+if zones_file.exists():
+    NO_PARKING_ZONES = json.loads(zones_file.read_text())
+
+def load_parking_system():
+    """Import and construct the detection system, falling back to the mock without the ML stack"""
+    global parking_system, PARKING_DETECTION_AVAILABLE, detection_status
+    detection_status = "loading"
+    start = time.time()
+    
+    try:
+        try:
+            from parking_detection import ParkingDetectionSystem
+        except ImportError as e:
+            print(f"Warning: Parking detection not available ({e}). Using mock detection for local development.")
+            system, available = MockParkingDetectionSystem(), False
+        else:
+            system, available = ParkingDetectionSystem(), True
+        
+        for name, polygons in NO_PARKING_ZONES.items():
+            if name not in AVAILABLE_VIDEOS:
+                print(f"Warning: no-parking zones configured for unknown video '{name}'")
+                continue
+            system.set_no_parking_zones(name, polygons)
+    except Exception:
+        detection_status = "failed"
+        raise
+    
+    # Publish only a fully configured system; parking_system first, since requests
+    # check PARKING_DETECTION_AVAILABLE before dereferencing it
+    parking_system = system
+    PARKING_DETECTION_AVAILABLE = available
+    detection_status = "ready"
+    logger.info(f"Parking detection system ready in {time.time() - start:.1f}s")
+    return system
+
+async def ensure_parking_system():
+    """Start loading the detection system if needed and wait until it is ready"""
+    global detection_task
+    if detection_task is None:
+        detection_task = asyncio.ensure_future(run_in_threadpool(load_parking_system))
+    task = detection_task
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        # Forget the failed attempt so the next caller retries instead of re-raising forever
+        if detection_task is task and task.done():
+            detection_task = None
+        raise
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -81,14 +151,22 @@ class ConnectionManager:
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        # A failed broadcast may already have dropped this connection
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                # Remove broken connections
+        # Encode once, then fan out to every client concurrently
+        data = dumps(message).decode()
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(data) for connection in connections),
+            return_exceptions=True
+        )
+        
+        # Remove broken connections
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception) and connection in self.active_connections:
                 self.active_connections.remove(connection)
 
 manager = ConnectionManager()
@@ -109,6 +187,7 @@ class ViolationLog(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     duration: float
     violation_type: str = "no_parking_zone"
+    ended_at: Optional[datetime] = None
 
 # Basic routes
 @api_router.get("/")
@@ -133,12 +212,15 @@ def create_demo_video(video_path: Path):
         # Create directory if it doesn't exist
         video_path.parent.mkdir(parents=True, exist_ok=True)
         
+        import cv2
+        import numpy as np
+        
         # Create a simple 1-second black video using OpenCV
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(str(video_path), fourcc, 1.0, (640, 480))
         
         # Create a black frame
-        frame = cv2.zeros((480, 640, 3), dtype=cv2.uint8)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
         
         # Write a few frames
         for _ in range(5):
@@ -152,6 +234,22 @@ def create_demo_video(video_path: Path):
         video_path.touch()
 
 # Video-related routes
+@api_router.get("/ready")
+async def readiness():
+    """Readiness probe, 503 while the detection system is preloading (always ready when API-only)"""
+    ready = API_ONLY or detection_status == "ready" or (not PRELOAD_DETECTION and detection_status == "pending")
+    return FastJSONResponse(
+        {'ready': ready, 'api_only': API_ONLY, 'detection': detection_status},
+        status_code=200 if ready else 503
+    )
+
+@api_router.get("/metrics/feature-cache")
+async def feature_cache_metrics():
+    """Hit rate of the perceptual-hash feature cache"""
+    if not PARKING_DETECTION_AVAILABLE:
+        return {'enabled': False}
+    return {'enabled': True, **parking_system.feature_cache.stats()}
+
 @api_router.get("/videos")
 async def get_available_videos():
     """Get list of available videos"""
@@ -196,17 +294,177 @@ async def get_video_file(video_name: str, request: Request):
         filename=f"{video_name}.mp4"
     )
 
+def decode_frame(frame_data):
+    """Decode a base64 (optionally data-URL prefixed) image into a BGR frame, None if invalid"""
+    if not frame_data:
+        return None
+    try:
+        import cv2
+        import numpy as np
+        
+        if ',' in frame_data and frame_data.startswith('data:'):
+            frame_data = frame_data.split(',', 1)[1]
+        buffer = np.frombuffer(base64.b64decode(frame_data), dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+def alert_to_violation(alert, ended=False):
+    """Convert a detection alert into a violation log document keyed by the alert id"""
+    return ViolationLog(
+        id=alert['id'],
+        vehicle_id=alert['vehicle_id'],
+        location=alert['camera'],
+        timestamp=datetime.utcfromtimestamp(alert['timestamp']),
+        duration=alert['duration'],
+        ended_at=datetime.utcfromtimestamp(alert['last_seen']) if ended else None
+    ).dict()
+
+async def upsert_violation(violation_dict):
+    """Insert a violation unless one with the same id exists, returns True if it was inserted"""
+    try:
+        result = await db.violations.update_one(
+            {'id': violation_dict['id']},
+            {'$setOnInsert': violation_dict},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return result.upserted_id is not None
+
+# Serializes violation writes so an episode's close never overtakes its insert,
+# created lazily so it binds to the server's event loop
+violation_write_lock = None
+background_tasks = set()
+
+def spawn(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def emit_violations(raised_alerts, ended_alerts):
+    """Persist and broadcast violations raised by the detection pipeline"""
+    global violation_write_lock
+    if violation_write_lock is None:
+        violation_write_lock = asyncio.Lock()
+    
+    async with violation_write_lock:
+        try:
+            for alert in raised_alerts:
+                violation_dict = alert_to_violation(alert)
+                if await upsert_violation(violation_dict):
+                    await manager.broadcast({
+                        'type': 'new_violation',
+                        'data': violation_dict
+                    })
+            
+            for alert in ended_alerts:
+                violation_dict = alert_to_violation(alert, ended=True)
+                final = {'duration': violation_dict.pop('duration'), 'ended_at': violation_dict.pop('ended_at')}
+                await db.violations.update_one(
+                    {'id': violation_dict['id']},
+                    {'$set': final, '$setOnInsert': violation_dict},
+                    upsert=True
+                )
+        except Exception as e:
+            logger.error(f"Failed to emit violations: {e}")
+
+ROLLUP_GRANULARITIES = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+def rollup_bucket(moment, granularity):
+    """Floor a datetime to the start of its minute, hour or day bucket"""
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+async def record_occupancy(camera, result):
+    """Fold one processed frame into the camera's minute, hour and day rollup documents"""
+    vehicles = len(result['vehicles'])
+    violations = sum(1 for vehicle in result['vehicles'] if vehicle['status'] == 'violation')
+    dwells = [track['dwell'] for track in result['ended_tracks']]
+    
+    increments = {
+        'frames': 1,
+        'vehicle_sum': vehicles,
+        'violation_sum': violations,
+        'new_violations': len(result['new_alerts']),
+        'dwell_sum': sum(dwells),
+        'dwell_count': len(dwells)
+    }
+    maxima = {'vehicles_max': vehicles, 'violations_max': violations}
+    if dwells:
+        maxima['dwell_max'] = max(dwells)
+    
+    moment = datetime.utcfromtimestamp(result['timestamp'])
+    operations = [
+        UpdateOne(
+            {'camera': camera, 'granularity': granularity, 'bucket': rollup_bucket(moment, granularity)},
+            {'$inc': increments, '$max': maxima},
+            upsert=True
+        )
+        for granularity in ROLLUP_GRANULARITIES
+    ]
+    try:
+        await db.occupancy_rollups.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to record occupancy for {camera}: {e}")
+
+def summarize_rollup(rollup):
+    """Add averages derived from the summed counters of a rollup document"""
+    frames = rollup.get('frames') or 1
+    rollup['avg_vehicles'] = rollup.get('vehicle_sum', 0) / frames
+    rollup['avg_violations'] = rollup.get('violation_sum', 0) / frames
+    rollup['avg_dwell'] = rollup['dwell_sum'] / rollup['dwell_count'] if rollup.get('dwell_count') else 0.0
+    return rollup
+
+def rollup_range(granularity, start, end):
+    """Validate the granularity and default the time range to the last 60 buckets"""
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {list(ROLLUP_GRANULARITIES)}")
+    end = end or datetime.utcnow()
+    start = start or end - 60 * ROLLUP_GRANULARITIES[granularity]
+    return start, end
+
 @api_router.post("/process-frame")
 async def process_frame_endpoint(request: dict):
     """Process a single frame for parking detection"""
+    if API_ONLY:
+        # Never answer with made-up detections from a replica that cannot run inference
+        raise HTTPException(status_code=503, detail="Frame processing is disabled on this API-only replica")
+    
+    # The name keys per-camera state, so only known cameras may create it
+    video_name = request.get('video_name')
+    if video_name not in FRAME_CAMERAS:
+        raise HTTPException(status_code=404, detail=f"Unknown camera '{video_name}'")
+    
     try:
-        # This would typically receive base64 encoded frame data
-        # For now, we'll return mock data
-        
         frame_data = request.get('frame_data')
-        video_name = request.get('video_name', 'unknown')
         
-        # Mock processing result
+        frame = decode_frame(frame_data)
+        if frame is not None:
+            await ensure_parking_system()
+        
+        if frame is not None and PARKING_DETECTION_AVAILABLE:
+            start = time.time()
+            result = await run_in_threadpool(parking_system.process_frame, frame, camera=video_name)
+            result['processing_time'] = time.time() - start
+            
+            # Write violations in the background so the response never waits on Mongo
+            ended_alerts = parking_system.pop_expired_alerts()
+            if result['new_alerts'] or ended_alerts:
+                spawn(emit_violations(result['new_alerts'], ended_alerts))
+            spawn(record_occupancy(video_name, result))
+            return FastJSONResponse(result)
+        
+        # Mock processing result when detection is unavailable or the frame is not an image
         result = {
             'prediction': 'No Parking Zone',
             'vehicles': [
@@ -233,7 +491,11 @@ async def process_frame_endpoint(request: dict):
 async def reset_alerts():
     """Reset all parking violation alerts"""
     try:
-        parking_system.reset_alerts()
+        if parking_system is not None:
+            # Close the cut-short episodes so their documents get a final duration
+            ended_alerts = await run_in_threadpool(parking_system.reset_alerts)
+            if ended_alerts:
+                spawn(emit_violations([], ended_alerts))
         
         # Broadcast reset to all connected clients
         await manager.broadcast({
@@ -247,16 +509,17 @@ async def reset_alerts():
 
 @api_router.post("/violations", response_model=ViolationLog)
 async def log_violation(violation: ViolationLog):
-    """Log a parking violation"""
+    """Log a parking violation, re-posting an existing id does not create a duplicate"""
     try:
         violation_dict = violation.dict()
-        _ = await db.violations.insert_one(violation_dict)
+        inserted = await upsert_violation(violation_dict)
         
-        # Broadcast violation to all connected clients
-        await manager.broadcast({
-            'type': 'new_violation',
-            'data': violation_dict
-        })
+        # Broadcast violation to all connected clients, once per id
+        if inserted:
+            await manager.broadcast({
+                'type': 'new_violation',
+                'data': violation_dict
+            })
         
         return violation
     except Exception as e:
@@ -266,8 +529,76 @@ async def log_violation(violation: ViolationLog):
 async def get_violations():
     """Get all parking violations"""
     try:
-        violations = await db.violations.find().sort("timestamp", -1).to_list(100)
-        return [ViolationLog(**violation) for violation in violations]
+        # Documents were validated on write, pass them through without re-validation
+        violations = await db.violations.find({}, {'_id': 0}).sort("timestamp", -1).to_list(100)
+        return FastJSONResponse(violations)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/stats/occupancy")
+async def get_occupancy(
+    camera: Optional[str] = None,
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(2000, ge=1, le=10000)
+):
+    """Occupancy and violation rollups per camera and time bucket, oldest first.
+
+    ``truncated`` is true when the range holds more than ``limit`` buckets;
+    narrow the range or use a coarser granularity to get the newest ones.
+    """
+    start, end = rollup_range(granularity, start, end)
+    query = {'granularity': granularity, 'bucket': {'$gte': rollup_bucket(start, granularity), '$lt': end}}
+    if camera:
+        query['camera'] = camera
+    
+    try:
+        rollups = await db.occupancy_rollups.find(query, {'_id': 0}).sort("bucket", 1).to_list(limit + 1)
+        truncated = len(rollups) > limit
+        return FastJSONResponse({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'truncated': truncated,
+            'buckets': [summarize_rollup(rollup) for rollup in rollups[:limit]]
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/stats/summary")
+async def get_occupancy_summary(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Per-camera totals over a time range, aggregated from the rollups"""
+    start, end = rollup_range(granularity, start, end)
+    pipeline = [
+        {'$match': {'granularity': granularity, 'bucket': {'$gte': rollup_bucket(start, granularity), '$lt': end}}},
+        {'$group': {
+            '_id': '$camera',
+            'frames': {'$sum': '$frames'},
+            'vehicle_sum': {'$sum': '$vehicle_sum'},
+            'violation_sum': {'$sum': '$violation_sum'},
+            'new_violations': {'$sum': '$new_violations'},
+            'dwell_sum': {'$sum': '$dwell_sum'},
+            'dwell_count': {'$sum': '$dwell_count'},
+            'vehicles_max': {'$max': '$vehicles_max'},
+            'dwell_max': {'$max': '$dwell_max'}
+        }},
+        {'$sort': {'_id': 1}}
+    ]
+    
+    try:
+        cameras = await db.occupancy_rollups.aggregate(pipeline).to_list(None)
+        for summary in cameras:
+            summary['camera'] = summary.pop('_id')
+        return FastJSONResponse({
+            'start': start,
+            'end': end,
+            'cameras': [summarize_rollup(summary) for summary in cameras]
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -282,7 +613,7 @@ async def websocket_endpoint(websocket: WebSocket):
             message = json.loads(data)
             
             if message.get('type') == 'ping':
-                await websocket.send_text(json.dumps({'type': 'pong'}))
+                await websocket.send_text(dumps({'type': 'pong'}).decode())
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -308,6 +639,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await db.violations.create_index("id", unique=True)
+    except Exception as e:
+        logger.warning(f"Could not create violations index: {e}")
+    
+    try:
+        await db.occupancy_rollups.create_index(
+            [("granularity", 1), ("camera", 1), ("bucket", 1)], unique=True
+        )
+    except Exception as e:
+        logger.warning(f"Could not create occupancy rollups index: {e}")
+
+async def preload_parking_system(max_delay=300):
+    """Load the detection system, retrying with exponential backoff until it succeeds"""
+    delay = 5
+    while True:
+        try:
+            await ensure_parking_system()
+            return
+        except Exception as e:
+            logger.error(f"Failed to load parking detection, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+@app.on_event("startup")
+async def preload_detection():
+    # Load models in the background so uvicorn accepts connections immediately
+    if not API_ONLY and PRELOAD_DETECTION:
+        spawn(preload_parking_system())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -318,4 +681,5 @@ if __name__ == "__main__":
     print(f"Starting server on http://0.0.0.0:{port}")
     print(f"Environment: {os.environ.get('ENVIRONMENT', 'production')}")
     print(f"Videos directory: {videos_dir}")
+    print(f"Mode: {'API only' if API_ONLY else 'API + detection'}")
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
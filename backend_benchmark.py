@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+RESULTS_DIR = ROOT_DIR / "benchmark_results"
+
+# Importing server.py in API-only mode should stay well below this
+COLD_START_TARGET_SECONDS = 1.5
+ML_MODULES = ('cv2', 'torch', 'torchvision', 'ultralytics', 'sklearn', 'pandas')
+
+# The backend modules are plain scripts living in backend/, make them importable
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def git_commit():
+    """Return the short hash of the current commit, or 'unknown'"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+class ParkingSystemBenchmark:
+    def __init__(self, rounds=20, warmup=2, mongo="mock", mongo_url=None):
+        self.rounds = rounds
+        self.warmup = warmup
+        self.mongo = mongo
+        self.mongo_url = mongo_url or os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        self.results = {}
+        self.skipped = {}
+        self._parking_system = None
+
+    def measure(self, name, func, rounds=None, warmup=None, params=None):
+        """Time func() over several rounds and record summary statistics (seconds)"""
+        rounds = rounds or self.rounds
+        warmup = self.warmup if warmup is None else warmup
+
+        for _ in range(warmup):
+            func()
+
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        self._record(name, timings, params)
+
+    def measure_async(self, name, coro_factory, rounds=None, warmup=None, params=None):
+        """Same as measure() for coroutines, each round awaits a fresh coroutine"""
+        loop = asyncio.new_event_loop()
+        try:
+            self.measure(
+                name,
+                lambda: loop.run_until_complete(coro_factory()),
+                rounds=rounds,
+                warmup=warmup,
+                params=params,
+            )
+        finally:
+            loop.close()
+
+    def _record(self, name, timings, params):
+        timings = sorted(timings)
+        self.results[name] = {
+            'rounds': len(timings),
+            'min': timings[0],
+            'max': timings[-1],
+            'mean': statistics.mean(timings),
+            'median': statistics.median(timings),
+            'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'params': params or {},
+        }
+        print(f"   {name:<48} median {timings[len(timings) // 2] * 1000:10.3f} ms")
+
+    def skip(self, group, reason):
+        self.skipped[group] = reason
+        print(f"⚠️  Skipping {group}: {reason}")
+
+    # ------------------------------------------------------------------
+    # Fixtures
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def random_boxes(count, width=1280, height=720, seed=0):
+        rng = random.Random(seed)
+        boxes = []
+        for _ in range(count):
+            x1 = rng.randint(0, width - 80)
+            y1 = rng.randint(0, height - 60)
+            boxes.append([x1, y1, x1 + rng.randint(40, 80), y1 + rng.randint(30, 60)])
+        return boxes
+
+    @staticmethod
+    def jitter_boxes(boxes, rng, amount=3):
+        return [[c + rng.randint(-amount, amount) for c in box] for box in boxes]
+
+    @staticmethod
+    def load_frames(max_frames=10):
+        """Read frames from backend/videos, falling back to synthetic frames"""
+        import cv2
+        import numpy as np
+
+        frames = []
+        for video_path in sorted((BACKEND_DIR / "videos").glob("*.mp4")):
+            capture = cv2.VideoCapture(str(video_path))
+            while len(frames) < max_frames:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frames.append(frame)
+            capture.release()
+            if len(frames) >= max_frames:
+                break
+
+        if not frames:
+            print("   No readable videos in backend/videos, using synthetic 640x480 frames")
+            rng = np.random.default_rng(0)
+            frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(max_frames)]
+
+        return frames
+
+    def get_parking_system(self):
+        if self._parking_system is None:
+            from parking_detection import ParkingDetectionSystem
+            self._parking_system = ParkingDetectionSystem()
+        return self._parking_system
+
+    # ------------------------------------------------------------------
+    # Benchmarks
+    # ------------------------------------------------------------------
+
+    def bench_tracking(self):
+        """calculate_iou and VehicleTracker.update at various box counts"""
+        try:
+            from parking_detection import calculate_iou, VehicleTracker
+        except ImportError as e:
+            self.skip("tracking", str(e))
+            return
+
+        pairs = list(zip(self.random_boxes(1000, seed=1), self.random_boxes(1000, seed=2)))
+
+        def iou_batch():
+            for box1, box2 in pairs:
+                calculate_iou(box1, box2)
+
+        self.measure("calculate_iou[1000 pairs]", iou_batch, params={'pairs': len(pairs)})
+
+        for count in (1, 10, 50, 200):
+            boxes = self.random_boxes(count)
+            tracker = VehicleTracker(iou_threshold=0.3)
+            rng = random.Random(count)
+            clock = [0.0]
+
+            def tracker_step():
+                clock[0] += 0.1
+                tracker.update(self.jitter_boxes(boxes, rng), clock[0], True)
+
+            self.measure(f"VehicleTracker.update[{count} boxes]", tracker_step, params={'boxes': count})
+
+        try:
+            from parking_detection import ZoneMask
+        except ImportError as e:
+            self.skip("zone_mask", str(e))
+            return
+
+        zone_mask = ZoneMask([[[0.0, 0.5], [0.5, 0.5], [0.5, 1.0], [0.0, 1.0]]])
+        zone_mask.get_integral(720, 1280)
+        for count in (10, 200):
+            boxes = self.random_boxes(count)
+            self.measure(f"ZoneMask.contains[{count} boxes]",
+                         lambda: zone_mask.contains(boxes, (720, 1280, 3)), params={'boxes': count})
+
+    def bench_detection(self):
+        """Feature extraction, zone prediction and full process_frame on real frames"""
+        try:
+            parking_system = self.get_parking_system()
+            frames = self.load_frames()
+        except ImportError as e:
+            self.skip("detection", str(e))
+            return
+
+        index = [0]
+
+        def next_frame():
+            frame = frames[index[0] % len(frames)]
+            index[0] += 1
+            return frame
+
+        rounds = min(self.rounds, 10)
+        self.measure("extract_features_from_frame",
+                     lambda: parking_system.extract_features_from_frame(next_frame()), rounds=rounds)
+        self.measure("predict_from_frame",
+                     lambda: parking_system.predict_from_frame(next_frame()), rounds=rounds)
+
+        # Same frames through the perceptual-hash cache, every round after the first pass hits
+        parking_system.feature_cache.clear()
+        self.measure("predict_from_frame[cached]",
+                     lambda: parking_system.predict_from_frame(next_frame(), camera="benchmark"),
+                     rounds=max(rounds, len(frames) * 2))
+        self.results["predict_from_frame[cached]"]['params'] = {'cache': parking_system.feature_cache.stats()}
+
+        # Uncached pipeline, the cache is emptied before every frame so each round does the full work
+        def process_uncached():
+            parking_system.feature_cache.clear()
+            parking_system.process_frame(next_frame())
+
+        self.measure("process_frame", process_uncached, rounds=rounds)
+
+        parking_system.feature_cache.clear()
+        self.measure("process_frame[cached]",
+                     lambda: parking_system.process_frame(next_frame()),
+                     rounds=max(rounds, len(frames) * 2))
+
+    def bench_broadcast(self):
+        """ConnectionManager.broadcast fan-out to in-process fake sockets"""
+        try:
+            from server import ConnectionManager
+        except ImportError as e:
+            self.skip("broadcast", str(e))
+            return
+
+        class FakeWebSocket:
+            async def send_text(self, data):
+                pass
+
+        message = {
+            'type': 'new_violation',
+            'data': {
+                'id': str(uuid.uuid4()),
+                'vehicle_id': 1,
+                'location': 'AB-1 Parking',
+                'timestamp': time.time(),
+                'duration': 6.5,
+                'violation_type': 'no_parking_zone',
+            }
+        }
+
+        for count in (10, 100, 1000):
+            manager = ConnectionManager()
+            manager.active_connections = [FakeWebSocket() for _ in range(count)]
+            self.measure_async(f"ConnectionManager.broadcast[{count} clients]",
+                               lambda: manager.broadcast(message), params={'clients': count})
+
+    def bench_serialization(self):
+        """stdlib json vs orjson encoding of violation lists and detection payloads"""
+        try:
+            import numpy as np
+            from serialization import dumps
+        except ImportError as e:
+            self.skip("serialization", str(e))
+            return
+
+        for count in (100, 10000):
+            violations = [{
+                'id': str(uuid.uuid4()),
+                'vehicle_id': i,
+                'location': 'AB-1 Parking',
+                'timestamp': datetime.utcnow(),
+                'duration': 6.5,
+                'violation_type': 'no_parking_zone',
+                'ended_at': None,
+            } for i in range(count)]
+            rounds = self.rounds if count <= 100 else max(3, self.rounds // 4)
+
+            self.measure(f"json.dumps[{count} violations]",
+                         lambda: json.dumps(violations, default=str), rounds=rounds, params={'items': count})
+            self.measure(f"orjson dumps[{count} violations]",
+                         lambda: dumps(violations), rounds=rounds, params={'items': count})
+
+            try:
+                from server import ViolationLog
+                from fastapi.encoders import jsonable_encoder
+            except ImportError:
+                continue
+            # The previous get_violations path: build models, re-validate, encode
+            self.measure(f"ViolationLog+jsonable_encoder[{count} violations]",
+                         lambda: json.dumps(jsonable_encoder([ViolationLog(**v) for v in violations])),
+                         rounds=rounds, params={'items': count})
+
+        detection = {
+            'prediction': 'No Parking Zone',
+            'vehicles': [{
+                'id': i,
+                'bbox': np.array([100, 100, 200, 200], dtype=np.int32),
+                'class': 'car',
+                'confidence': np.float32(0.9),
+                'duration': 7.5,
+                'in_no_parking_zone': np.bool_(True),
+                'status': 'violation',
+            } for i in range(100)],
+            'timestamp': time.time(),
+        }
+        self.measure("orjson dumps[detection payload, 100 vehicles]", lambda: dumps(detection))
+
+    def bench_cold_start(self):
+        """Interpreter start plus `import server` in API-only mode, checked against the target"""
+        script = (
+            "import json, sys; import server; "
+            f"print(json.dumps([m for m in {ML_MODULES!r} if m in sys.modules]))"
+        )
+        env = dict(os.environ, API_ONLY="1")
+        loaded = []
+
+        def cold_start():
+            output = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            loaded[:] = json.loads(output.strip().splitlines()[-1])
+
+        try:
+            cold_start()
+        except subprocess.CalledProcessError as e:
+            self.skip("cold_start", e.stderr.strip().splitlines()[-1] if e.stderr else str(e))
+            return
+
+        self.measure("cold_start[API_ONLY import server]", cold_start, rounds=min(self.rounds, 5), warmup=0,
+                     params={'target_s': COLD_START_TARGET_SECONDS, 'ml_modules_loaded': loaded})
+
+        median = self.results["cold_start[API_ONLY import server]"]['median']
+        if loaded:
+            print(f"❌ API-only startup imported ML modules: {', '.join(loaded)}")
+        if median > COLD_START_TARGET_SECONDS:
+            print(f"❌ Cold start {median:.2f}s exceeds target {COLD_START_TARGET_SECONDS:.1f}s")
+
+    def bench_violations_db(self):
+        """Violation writes as the server issues them (upserts against the unique id index)
+        and the latest-100 query, against mongomock or a local mongod"""
+        try:
+            if self.mongo == "mock":
+                import mongomock
+                client = mongomock.MongoClient()
+            else:
+                from pymongo import MongoClient
+                client = MongoClient(self.mongo_url, serverSelectionTimeoutMS=2000)
+                client.admin.command('ping')
+        except Exception as e:
+            self.skip("violations_db", str(e))
+            return
+
+        collection = client['parking_benchmark']['violations']
+        collection.drop()
+        collection.create_index("id", unique=True)
+
+        def violation_doc():
+            return {
+                'id': str(uuid.uuid4()),
+                'vehicle_id': random.randint(0, 10000),
+                'location': 'AB-1 Parking',
+                'timestamp': datetime.utcnow(),
+                'duration': random.uniform(5, 120),
+                'violation_type': 'no_parking_zone',
+            }
+
+        inserted = []
+
+        def raise_violation():
+            # upsert_violation: insert the episode unless its id already exists
+            doc = violation_doc()
+            inserted.append(doc)
+            collection.update_one({'id': doc['id']}, {'$setOnInsert': doc}, upsert=True)
+
+        def raise_again():
+            # A frame re-emitting an episode that is already stored
+            doc = random.choice(inserted)
+            collection.update_one({'id': doc['id']}, {'$setOnInsert': doc}, upsert=True)
+
+        def close_violation():
+            # emit_violations for an ended episode: final duration, insert if never stored
+            doc = dict(random.choice(inserted))
+            final = {'duration': doc.pop('duration') + 30, 'ended_at': datetime.utcnow()}
+            collection.update_one({'id': doc['id']}, {'$set': final, '$setOnInsert': doc}, upsert=True)
+
+        params = {'backend': self.mongo, 'index': 'id unique'}
+        self.measure("violations.upsert[new]", raise_violation, rounds=self.rounds * 10, params=params)
+        self.measure("violations.upsert[existing]", raise_again, rounds=self.rounds * 10, params=params)
+        self.measure("violations.close", close_violation, rounds=self.rounds * 10, params=params)
+
+        collection.insert_many([violation_doc() for _ in range(10000)])
+        self.measure("violations.find_latest_100",
+                     lambda: list(collection.find().sort("timestamp", -1).limit(100)),
+                     params={'backend': self.mongo, 'documents': collection.count_documents({})})
+
+        client.drop_database('parking_benchmark')
+
+    GROUPS = {
+        'tracking': bench_tracking,
+        'detection': bench_detection,
+        'broadcast': bench_broadcast,
+        'serialization': bench_serialization,
+        'cold_start': bench_cold_start,
+        'violations_db': bench_violations_db,
+    }
+
+    def run(self, groups=None):
+        for group in groups or self.GROUPS:
+            print(f"\n📋 Running {group} benchmarks...")
+            self.GROUPS[group](self)
+
+    def report(self):
+        return {
+            'commit': git_commit(),
+            'created_at': datetime.utcnow().isoformat(),
+            'python': sys.version.split()[0],
+            'rounds': self.rounds,
+            'benchmarks': self.results,
+            'skipped': self.skipped,
+        }
+
+
+def compare(current, baseline, threshold):
+    """Print median deltas against a baseline report, return the number of regressions"""
+    regressions = 0
+    print(f"\n📊 Comparison against {baseline.get('commit', 'baseline')} (threshold {threshold:.0%})")
+    for name, stats in current['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            print(f"   {name:<48} new")
+            continue
+
+        change = (stats['median'] - previous['median']) / previous['median'] if previous['median'] else 0.0
+        marker = "❌" if change > threshold else "✅"
+        if change > threshold:
+            regressions += 1
+        print(f"{marker} {name:<48} {previous['median'] * 1000:10.3f} -> {stats['median'] * 1000:10.3f} ms ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection and serving hot paths")
+    parser.add_argument("--only", nargs="+", choices=list(ParkingSystemBenchmark.GROUPS), help="Benchmark groups to run")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed rounds per benchmark")
+    parser.add_argument("--mongo", choices=["mock", "local"], default="mock", help="Use mongomock or the mongod at MONGO_URL")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report (default benchmark_results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative median slowdown counted as a regression")
+    args = parser.parse_args()
+
+    print("🚀 Starting Parking Detection System Benchmarks")
+    print("=" * 60)
+
+    bench = ParkingSystemBenchmark(rounds=args.rounds, mongo=args.mongo)
+    bench.run(args.only)
+    report = bench.report()
+
+    output = args.output or RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print("\n" + "=" * 60)
+    print(f"💾 Results written to {output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f"⚠️  {regressions} benchmark(s) regressed")
+            return 1
+        print("🎉 No regressions detected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
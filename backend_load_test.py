@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+import websockets
+
+VIDEOS_DIR = Path(__file__).parent / "backend" / "videos"
+
+# Frames and violations are written under this camera so they never mix with a real
+# camera's tracker, alerts and rollups; the server must list it in EXTRA_CAMERAS
+LOAD_TEST_CAMERA = "Load Test"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LatencyStats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.status_codes = {}
+        self.started = None
+        self.finished = None
+        self.feature_cache = None  # feature cache hits/partial_hits/misses during the run
+
+    def record(self, latency, ok, status=None):
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+        if status is not None:
+            self.status_codes[str(status)] = self.status_codes.get(str(status), 0) + 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'requests': len(latencies) + self.errors,
+            'errors': self.errors,
+            'status_codes': self.status_codes,
+            'elapsed_s': elapsed,
+            'throughput_rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+            'feature_cache': self.feature_cache,
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"   {self.name:<20} {s['requests']:>7} req  {s['errors']:>5} err  "
+              f"{s['throughput_rps']:>9.1f} req/s  p50 {s['p50_ms']:8.2f}  p95 {s['p95_ms']:8.2f}  "
+              f"p99 {s['p99_ms']:8.2f} ms")
+        if self.feature_cache:
+            print(f"   {'':<20} feature cache: {self.feature_cache['hits']} hits, "
+                  f"{self.feature_cache['partial_hits']} partial, {self.feature_cache['misses']} misses")
+
+
+class ParkingSystemLoadTester:
+    def __init__(self, base_url, concurrency=32, total_requests=1000, timeout=30, camera=LOAD_TEST_CAMERA):
+        self.base_url = base_url.rstrip('/')
+        self.api_url = f"{self.base_url}/api"
+        self.ws_url = self.base_url.replace("https://", "wss://").replace("http://", "ws://") + "/ws"
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.timeout = timeout
+        self.camera = camera
+        self.frames = []  # base64 payloads /process-frame rotates through
+        self._local = threading.local()
+
+    def load_frames(self, paths):
+        """Use image files as the /process-frame payloads"""
+        self.frames = [base64.b64encode(Path(path).read_bytes()).decode() for path in paths]
+
+    def load_video_frames(self, count):
+        """Take up to count frames spread evenly over backend/videos as JPEG payloads,
+        returns False if none could be read"""
+        try:
+            import cv2
+        except ImportError:
+            return False
+
+        video_paths = sorted(VIDEOS_DIR.glob("*.mp4"))
+        per_video = max(1, -(-count // max(1, len(video_paths))))
+        for video_path in video_paths:
+            capture = cv2.VideoCapture(str(video_path))
+            total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            step = max(1, total // per_video)
+            for index in range(0, max(total, 1), step):
+                if len(self.frames) >= count:
+                    break
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                ok, encoded = cv2.imencode(".jpg", frame)
+                if ok:
+                    self.frames.append(base64.b64encode(encoded.tobytes()).decode())
+            capture.release()
+
+        if self.frames:
+            print(f"   Rotating {len(self.frames)} frames of backend/videos as /process-frame payloads")
+        return bool(self.frames)
+
+    def feature_cache_counters(self):
+        """The server's feature cache counters for our camera, None when detection is unavailable"""
+        try:
+            stats = self.session.get(f"{self.api_url}/metrics/feature-cache", timeout=self.timeout).json()
+        except Exception:
+            return None
+        if not stats.get('enabled'):
+            return None
+        return stats['cameras'].get(self.camera, {'hits': 0, 'partial_hits': 0, 'misses': 0})
+
+    @property
+    def session(self):
+        # requests.Session is not thread-safe, keep one per worker thread
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    # ------------------------------------------------------------------
+    # HTTP scenarios, each returns the response of a single request
+    # ------------------------------------------------------------------
+
+    def process_frame(self, i):
+        return self.session.post(f"{self.api_url}/process-frame", timeout=self.timeout, json={
+            'frame_data': self.frames[i % len(self.frames)],
+            'video_name': self.camera,
+        })
+
+    def post_violation(self, i):
+        return self.session.post(f"{self.api_url}/violations", timeout=self.timeout, json={
+            'vehicle_id': i,
+            'location': self.camera,
+            'duration': 5.5,
+            'violation_type': "no_parking_zone",
+        })
+
+    def get_violations(self, i):
+        return self.session.get(f"{self.api_url}/violations", timeout=self.timeout)
+
+    def video_range(self, i):
+        # Fetch a 256 KiB window, like a player seeking through the stream
+        start = (i % 16) * 262144
+        return self.session.get(f"{self.api_url}/video/AB-1 Parking", timeout=self.timeout,
+                                headers={'Range': f"bytes={start}-{start + 262143}"})
+
+    SCENARIOS = {
+        'process-frame': process_frame,
+        'violations-post': post_violation,
+        'violations-get': get_violations,
+        'video-range': video_range,
+    }
+
+    def run_http(self, name):
+        stats = LatencyStats(name)
+        request = self.SCENARIOS[name]
+        cache_before = self.feature_cache_counters() if name == 'process-frame' else None
+
+        def worker(i):
+            start = time.perf_counter()
+            try:
+                response = request(self, i)
+                # Drain the body so latency covers the full transfer
+                _ = response.content
+                stats.record(time.perf_counter() - start, response.status_code < 400, response.status_code)
+            except Exception as e:
+                stats.record(time.perf_counter() - start, False, type(e).__name__)
+
+        stats.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(worker, range(self.total_requests)))
+        stats.finished = time.perf_counter()
+
+        if cache_before is not None:
+            # Report which path was measured: repeated frames are served from the feature cache
+            cache_after = self.feature_cache_counters() or cache_before
+            stats.feature_cache = {key: cache_after[key] - cache_before[key]
+                                   for key in ('hits', 'partial_hits', 'misses')}
+        return stats
+
+    # ------------------------------------------------------------------
+    # WebSocket scenario
+    # ------------------------------------------------------------------
+
+    async def _ws_subscriber(self, stats, pings, ramp, connected, release):
+        async with ramp:
+            try:
+                websocket = await websockets.connect(self.ws_url, open_timeout=self.timeout, max_queue=None)
+            except Exception as e:
+                stats.record(0.0, False, f"connect:{type(e).__name__}")
+                connected.append(False)
+                return
+        connected.append(True)
+
+        try:
+            # Hold every subscriber open until all have connected, then ping together
+            await release.wait()
+            for _ in range(pings):
+                start = time.perf_counter()
+                await websocket.send(json.dumps({'type': 'ping'}))
+                # Broadcasts may arrive in between, wait for our pong
+                while True:
+                    message = json.loads(await asyncio.wait_for(websocket.recv(), self.timeout))
+                    if message.get('type') == 'pong':
+                        break
+                stats.record(time.perf_counter() - start, True, "pong")
+        except Exception as e:
+            stats.record(0.0, False, type(e).__name__)
+        finally:
+            await websocket.close()
+
+    async def _run_websockets(self, clients, pings):
+        stats = LatencyStats("websocket-ping")
+        ramp = asyncio.Semaphore(self.concurrency)
+        release = asyncio.Event()
+        connected = []
+
+        tasks = [
+            asyncio.create_task(self._ws_subscriber(stats, pings, ramp, connected, release))
+            for _ in range(clients)
+        ]
+        while len(connected) < clients:
+            await asyncio.sleep(0.05)
+        print(f"   {sum(connected)}/{clients} WebSocket subscribers connected")
+
+        stats.started = time.perf_counter()
+        release.set()
+        await asyncio.gather(*tasks)
+        stats.finished = time.perf_counter()
+        return stats
+
+    def run_websockets(self, clients, pings):
+        return asyncio.run(self._run_websockets(clients, pings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the parking detection API and WebSocket layer")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--scenarios", nargs="+",
+                        choices=list(ParkingSystemLoadTester.SCENARIOS) + ['websocket'],
+                        default=list(ParkingSystemLoadTester.SCENARIOS) + ['websocket'])
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent HTTP workers / WebSocket connects")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per HTTP scenario")
+    parser.add_argument("--ws-clients", type=int, default=1000, help="WebSocket subscribers to hold open")
+    parser.add_argument("--ws-pings", type=int, default=5, help="Ping/pong round trips per subscriber")
+    parser.add_argument("--frame", type=Path, nargs="+",
+                        help="Image files to rotate through on /process-frame (default: frames of backend/videos)")
+    parser.add_argument("--frames", type=int, default=300,
+                        help="Video frames to rotate through when --frame is not given")
+    parser.add_argument("--camera", default=LOAD_TEST_CAMERA,
+                        help="Camera name frames and violations are written under (must be in the server's EXTRA_CAMERAS)")
+    parser.add_argument("--output", type=Path, help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    print("🚀 Starting Parking Detection System Load Test")
+    print(f"   Target: {args.base_url}")
+    print(f"   Writes violations, alerts and occupancy rollups under camera '{args.camera}'")
+    print("=" * 60)
+
+    tester = ParkingSystemLoadTester(args.base_url, concurrency=args.concurrency, total_requests=args.requests,
+                                     camera=args.camera)
+    if args.frame:
+        tester.load_frames(args.frame)
+    elif 'process-frame' in args.scenarios and not tester.load_video_frames(args.frames):
+        # A payload the server cannot decode only exercises the mock branch, not inference
+        print("❌ No readable video in backend/videos to take a frame from, pass --frame <image>")
+        return 2
+
+    results = []
+    for scenario in args.scenarios:
+        print(f"\n📋 Running {scenario}...")
+        if scenario == 'websocket':
+            stats = tester.run_websockets(args.ws_clients, args.ws_pings)
+        else:
+            stats = tester.run_http(scenario)
+        stats.print_summary()
+        results.append(stats)
+
+    print("\n" + "=" * 60)
+    print("📊 LOAD TEST RESULTS")
+    for stats in results:
+        stats.print_summary()
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'results': {stats.name: stats.summary() for stats in results},
+        }, indent=2))
+        print(f"💾 Results written to {args.output}")
+
+    return 1 if any(stats.errors for stats in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
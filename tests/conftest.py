@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules are plain scripts living in backend/, make them importable
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+@pytest.fixture
+def detection_system(monkeypatch):
+    """ParkingDetectionSystem without the YOLO/CNN/forest models, detections are scripted per test"""
+    import parking_detection
+
+    monkeypatch.setattr(parking_detection, "YOLO", lambda path: None)
+    monkeypatch.setattr(parking_detection.ParkingDetectionSystem, "_init_cnn_model", lambda self: None)
+    monkeypatch.setattr(parking_detection.ParkingDetectionSystem, "_load_or_create_model", lambda self: None)
+    return parking_detection.ParkingDetectionSystem(alert_ttl_seconds=10)
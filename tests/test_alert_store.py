@@ -0,0 +1,197 @@
+import threading
+
+import numpy as np
+
+import parking_detection
+from parking_detection import AlertStore
+
+
+def test_new_and_updated_alerts():
+    store = AlertStore()
+    alert, is_new = store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 100.0)
+    assert is_new
+    assert alert['vehicle_id'] == 1 and alert['camera'] == "cam"
+
+    same, is_new = store.upsert("cam", 1, [1, 1, 11, 11], 7.5, 101.0)
+    assert not is_new
+    assert same is alert
+    assert alert['duration'] == 7.0 and alert['bbox'] == [1, 1, 11, 11]
+
+
+def test_alert_stays_active_until_track_ends():
+    store = AlertStore(ttl_seconds=10)
+    store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 100.0)
+
+    # Not seen in this frame, but the track is still alive
+    store.update("cam", set(), set(), 150.0)
+    assert [a['vehicle_id'] for a in store.active("cam")] == [1]
+    assert store.pop_expired() == []
+
+
+def test_ended_alert_expires_after_ttl():
+    store = AlertStore(ttl_seconds=10)
+    store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 100.0)
+
+    store.update("cam", set(), {1}, 105.0)
+    assert store.active("cam") == []
+    assert store.pop_expired() == []
+
+    store.update("cam", set(), set(), 110.0)
+    expired = store.pop_expired()
+    assert [a['vehicle_id'] for a in expired] == [1]
+    assert expired[0]['ended']
+    assert store.pop_expired() == []
+
+
+def test_seen_refreshes_last_seen():
+    store = AlertStore(ttl_seconds=10)
+    store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 100.0)
+    store.update("cam", {1}, set(), 120.0)
+    store.update("cam", set(), {1}, 125.0)
+    assert store.pop_expired() == []
+    store.update("cam", set(), set(), 130.0)
+    assert len(store.pop_expired()) == 1
+
+
+def test_cap_per_camera_never_evicts_live_alerts():
+    store = AlertStore(max_alerts_per_camera=2)
+    for vehicle_id in range(3):
+        store.upsert("cam", vehicle_id, [0, 0, 10, 10], 6.0, 100.0 + vehicle_id)
+    store.upsert("other", 0, [0, 0, 10, 10], 6.0, 100.0)
+
+    assert store.upsert("cam", 2, [0, 0, 10, 10], 6.0, 104.0) == (None, False)
+    assert store.pop_expired() == []
+    assert [a['vehicle_id'] for a in store.active("cam")] == [0, 1]
+    assert len(store.active("other")) == 1
+
+
+def test_cap_evicts_ended_alerts_first():
+    store = AlertStore(ttl_seconds=100, max_alerts_per_camera=2)
+    store.upsert("cam", 0, [0, 0, 10, 10], 6.0, 100.0)
+    store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 101.0)
+    store.update("cam", set(), {1}, 102.0)
+
+    store.upsert("cam", 2, [0, 0, 10, 10], 6.0, 103.0)
+    assert [a['vehicle_id'] for a in store.pop_expired()] == [1]
+    assert [a['vehicle_id'] for a in store.active("cam")] == [0, 2]
+
+
+def test_more_violators_than_the_cap_do_not_churn(detection_system):
+    """A full camera must not evict and re-raise live episodes frame after frame"""
+    frame = np.zeros((100, 600, 3), dtype=np.uint8)
+    detection_system.alert_store.max_alerts_per_camera = 50
+    detection_system.get_vehicle_detections = lambda frame: [
+        {'bbox': [10 * i, 10, 10 * i + 8, 18], 'class': 'car', 'confidence': 0.9} for i in range(51)
+    ]
+    detection_system.predict_from_frame = lambda frame, camera=None: "No Parking Zone"
+
+    ids = set()
+    for _ in range(30):
+        result = detection_system.process_frame(frame, alert_threshold_seconds=0, camera="cam")
+        ids.update(alert['id'] for alert in result['new_alerts'])
+
+    assert len(ids) == 50
+    assert len(result['alerts']) == 50
+    assert detection_system.pop_expired_alerts() == []
+
+
+def test_missed_detections_keep_one_episode(detection_system, monkeypatch):
+    """Frames without detections must not split one track into two violations"""
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    box = {'bbox': [10, 10, 50, 50], 'class': 'car', 'confidence': 0.9}
+    detections = []
+    clock = [1000.0]
+    detection_system.get_vehicle_detections = lambda frame: list(detections)
+    detection_system.predict_from_frame = lambda frame, camera=None: "No Parking Zone"
+
+    monkeypatch.setattr(parking_detection.time, "time", lambda: clock[0])
+
+    ids = set()
+    for step in range(60):
+        clock[0] += 1
+        # The vehicle is missed for 20s in the middle of its stay
+        detections[:] = [] if 20 <= step < 40 else [box]
+        result = detection_system.process_frame(frame, camera="cam")
+        ids.update(alert['id'] for alert in result['new_alerts'])
+        if step >= 10:
+            assert len(result['alerts']) == 1
+
+    assert len(ids) == 1
+    assert detection_system.pop_expired_alerts() == []
+
+
+def test_episode_duration_spans_missed_detections(detection_system, monkeypatch):
+    """The tracker's timer restarts after a gap, the episode's duration must not"""
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    box = {'bbox': [10, 10, 50, 50], 'class': 'car', 'confidence': 0.9}
+    detections = []
+    clock = [1000.0]
+    detection_system.get_vehicle_detections = lambda frame: list(detections)
+    detection_system.predict_from_frame = lambda frame, camera=None: "No Parking Zone"
+
+    monkeypatch.setattr(parking_detection.time, "time", lambda: clock[0])
+
+    durations = []
+    for step in range(60):
+        clock[0] += 1
+        detections[:] = [] if 20 <= step < 30 else [box]
+        result = detection_system.process_frame(frame, camera="cam")
+        durations.extend(alert['duration'] for alert in result['alerts'])
+
+    assert durations == sorted(durations)
+    # Raised at 6s on the 7th frame, last seen 53s later
+    [alert] = detection_system.reset_alerts()
+    assert alert['duration'] == 59.0
+    assert alert['last_seen'] - alert['timestamp'] == 53.0
+
+
+def test_empty_scene_ages_out_the_track(detection_system, monkeypatch):
+    """A vehicle that left must not keep its alert while no detections come in"""
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    box = {'bbox': [10, 10, 50, 50], 'class': 'car', 'confidence': 0.9}
+    detections = [box]
+    clock = [1000.0]
+    detection_system.get_vehicle_detections = lambda frame: list(detections)
+    detection_system.predict_from_frame = lambda frame, camera=None: "No Parking Zone"
+
+    monkeypatch.setattr(parking_detection.time, "time", lambda: clock[0])
+
+    for _ in range(10):
+        clock[0] += 1
+        detection_system.process_frame(frame, camera="cam")
+
+    detections[:] = []
+    expired = []
+    for _ in range(3600):
+        clock[0] += 1
+        result = detection_system.process_frame(frame, camera="cam")
+        expired.extend(detection_system.pop_expired_alerts())
+
+    assert result['alerts'] == []
+    assert len(expired) == 1 and expired[0]['ended']
+    assert detection_system.get_tracker("cam").tracked_vehicles == []
+
+
+def test_concurrent_frames_of_one_camera(detection_system):
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    detection_system.get_vehicle_detections = lambda frame: [
+        {'bbox': [10 * i, 10, 10 * i + 8, 18], 'class': 'car', 'confidence': 0.9} for i in range(8)
+    ]
+    detection_system.predict_from_frame = lambda frame, camera=None: "No Parking Zone"
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                detection_system.process_frame(frame, alert_threshold_seconds=0, camera="cam")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(detection_system.get_tracker("cam").tracked_vehicles) == 8
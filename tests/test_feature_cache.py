@@ -0,0 +1,64 @@
+import numpy as np
+
+from parking_detection import FeatureCache, frame_hash
+
+
+def test_lru_eviction():
+    cache = FeatureCache(max_entries=2)
+    cache.put(("cam", 1), {'features': [1]})
+    cache.put(("cam", 2), {'features': [2]})
+    assert cache.get(("cam", 1), 'features') is not None  # 1 is now most recently used
+    cache.put(("cam", 3), {'features': [3]})
+
+    assert list(cache.entries) == [("cam", 1), ("cam", 3)]
+    assert cache.get(("cam", 2), 'features') is None
+
+
+def test_hit_partial_and_miss_counters():
+    cache = FeatureCache()
+    cache.put(("a", 1), {'features': [1]})
+    cache.put(("a", 2), {'features': [2], 'prediction': "Parking Zone"})
+
+    cache.get(("a", 1), 'features')
+    cache.get(("a", 1), 'prediction')
+    cache.get(("a", 2), 'prediction')
+    cache.get(("a", 3), 'prediction')
+    cache.get(("b", 1), 'prediction')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['partial_hits'], stats['misses']) == (2, 1, 2)
+    assert stats['hit_rate'] == 2 / 5
+    assert stats['cameras']['a'] == {'hits': 2, 'partial_hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    assert stats['cameras']['b']['hit_rate'] == 0.0
+    assert stats['entries'] == 2
+
+    cache.clear()
+    assert cache.stats()['hits'] == 0 and cache.stats()['entries'] == 0
+
+
+def test_frame_hash_ignores_small_noise():
+    rng = np.random.default_rng(0)
+    frame = np.repeat(np.linspace(0, 255, 320, dtype=np.uint8)[None, :, None], 240, axis=0).repeat(3, axis=2)
+    noisy = np.clip(frame.astype(np.int16) + rng.integers(-2, 3, frame.shape), 0, 255).astype(np.uint8)
+    assert frame_hash(frame) == frame_hash(noisy)
+    assert frame_hash(frame) != frame_hash(frame[:, ::-1].copy())
+
+
+def test_cached_prediction_skips_feature_extraction(detection_system):
+    calls = []
+    detection_system._compute_features = lambda frame: calls.append(1) or [1.0] + [0.0] * 11
+    frame = np.full((60, 80, 3), 128, dtype=np.uint8)
+
+    assert detection_system.extract_features_from_frame(frame, camera="cam")[0] == 1.0
+    # Features are cached, the prediction is computed from them without extraction
+    assert detection_system.predict_from_frame(frame, camera="cam") == "Parking Zone"
+    assert detection_system.predict_from_frame(frame, camera="cam") == "Parking Zone"
+    assert len(calls) == 1
+
+    stats = detection_system.feature_cache.stats()
+    assert (stats['hits'], stats['partial_hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_unhashable_frame_falls_back_to_defaults(detection_system):
+    assert detection_system.extract_features_from_frame(None, camera="cam") == [0] * 12
+    assert detection_system.predict_from_frame(None, camera="cam") == "Unknown Zone"
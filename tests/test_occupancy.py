@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = AsyncMongoMockClient()['test_database']
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+def frame_result(timestamp, statuses, new_alerts=0, dwells=()):
+    return {
+        'vehicles': [{'status': status} for status in statuses],
+        'new_alerts': [{}] * new_alerts,
+        'ended_tracks': [{'id': i, 'dwell': dwell} for i, dwell in enumerate(dwells)],
+        'timestamp': timestamp
+    }
+
+
+def test_rollup_bucket():
+    moment = datetime(2024, 5, 6, 7, 8, 9, 10)
+    assert server.rollup_bucket(moment, 'minute') == datetime(2024, 5, 6, 7, 8)
+    assert server.rollup_bucket(moment, 'hour') == datetime(2024, 5, 6, 7)
+    assert server.rollup_bucket(moment, 'day') == datetime(2024, 5, 6)
+
+
+def test_record_occupancy_increments(mock_db):
+    start = datetime(2024, 5, 6, 7, 8, 0).timestamp()
+
+    async def record():
+        await server.record_occupancy("cam", frame_result(start, ['normal', 'violation'], new_alerts=1))
+        await server.record_occupancy("cam", frame_result(start + 10, ['violation'], dwells=[12.0, 30.0]))
+        await server.record_occupancy("cam", frame_result(start + 70, []))
+        return await mock_db.occupancy_rollups.find({}, {'_id': 0}).to_list(None)
+
+    rollups = asyncio.run(record())
+    by_key = {(r['granularity'], r['bucket']): r for r in rollups}
+    first_minute = server.rollup_bucket(datetime.utcfromtimestamp(start), 'minute')
+
+    assert len(by_key) == 4  # two minutes, one hour, one day
+    minute = by_key[('minute', first_minute)]
+    assert minute['frames'] == 2
+    assert minute['vehicle_sum'] == 3
+    assert minute['violation_sum'] == 2
+    assert minute['new_violations'] == 1
+    assert minute['dwell_sum'] == 42.0 and minute['dwell_count'] == 2
+    assert minute['vehicles_max'] == 2 and minute['dwell_max'] == 30.0
+
+    hour = by_key[('hour', server.rollup_bucket(first_minute, 'hour'))]
+    assert hour['frames'] == 3 and hour['vehicle_sum'] == 3
+
+
+def test_occupancy_endpoint_flags_truncation(mock_db):
+    start = datetime(2024, 5, 6)
+    asyncio.run(mock_db.occupancy_rollups.insert_many([
+        {'camera': "cam", 'granularity': 'hour', 'bucket': start + timedelta(hours=i), 'frames': 1}
+        for i in range(5)
+    ]))
+
+    client = TestClient(server.app)
+    params = {'granularity': 'hour', 'start': start.isoformat(), 'end': (start + timedelta(days=1)).isoformat()}
+
+    body = client.get("/api/stats/occupancy", params=dict(params, limit=3)).json()
+    assert body['truncated'] is True
+    assert len(body['buckets']) == 3
+
+    body = client.get("/api/stats/occupancy", params=params).json()
+    assert body['truncated'] is False
+    assert len(body['buckets']) == 5
+
+    assert client.get("/api/stats/occupancy", params=dict(params, limit=0)).status_code == 422
+    assert client.get("/api/stats/occupancy", params=dict(params, granularity='week')).status_code == 400
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_api_only_refuses_frame_processing(monkeypatch):
+    monkeypatch.setattr(server, "API_ONLY", True)
+    client = TestClient(server.app)
+
+    response = client.post("/api/process-frame", json={'frame_data': "mock_base64_data", 'video_name': "AB-1 Parking"})
+    assert response.status_code == 503
+    assert "API-only" in response.json()['detail']
+
+    assert client.get("/api/ready").json()['ready'] is True
+
+
+def test_unknown_camera_is_rejected(monkeypatch):
+    monkeypatch.setattr(server, "API_ONLY", False)
+
+    async def must_not_load():
+        raise AssertionError("detection system loaded for an unknown camera")
+
+    monkeypatch.setattr(server, "ensure_parking_system", must_not_load)
+    client = TestClient(server.app)
+
+    response = client.post("/api/process-frame", json={'frame_data': "mock_base64_data", 'video_name': "cam-12345"})
+    assert response.status_code == 404
+
+    response = client.post("/api/process-frame", json={'frame_data': "mock_base64_data"})
+    assert response.status_code == 404
+
+
+def test_failed_detection_load_is_retried(monkeypatch):
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model download failed")
+        return "system"
+
+    monkeypatch.setattr(server, "load_parking_system", load)
+    monkeypatch.setattr(server, "detection_task", None)
+
+    async def ensure_twice():
+        try:
+            await server.ensure_parking_system()
+        except RuntimeError:
+            pass
+        return await server.ensure_parking_system()
+
+    assert asyncio.run(ensure_twice()) == "system"
+    assert len(attempts) == 2
+
+
+def test_failed_zone_setup_marks_detection_failed(monkeypatch):
+    import parking_detection
+
+    class BrokenZones:
+        def set_no_parking_zones(self, camera, polygons):
+            raise ValueError("bad polygon")
+
+    monkeypatch.setattr(parking_detection, "ParkingDetectionSystem", BrokenZones)
+    monkeypatch.setattr(server, "NO_PARKING_ZONES", {"AB-1 Parking": [[[0, 0], [1, 0]]]})
+    monkeypatch.setattr(server, "parking_system", None)
+    monkeypatch.setattr(server, "PARKING_DETECTION_AVAILABLE", False)
+    monkeypatch.setattr(server, "detection_status", "pending")
+
+    with pytest.raises(ValueError):
+        server.load_parking_system()
+
+    assert server.detection_status == "failed"
+    assert server.parking_system is None and server.PARKING_DETECTION_AVAILABLE is False
+    assert TestClient(server.app).get("/api/metrics/feature-cache").json() == {'enabled': False}
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from parking_detection import violation_key
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = AsyncMongoMockClient()['test_database']
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "violation_write_lock", None)
+    return db
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent = []
+
+    async def broadcast(message):
+        sent.append(message)
+
+    monkeypatch.setattr(server.manager, "broadcast", broadcast)
+    return sent
+
+
+def make_alert(vehicle_id=3, started=1000.0, duration=6.0):
+    return {
+        'id': violation_key("AB-1 Parking", vehicle_id, started),
+        'vehicle_id': vehicle_id,
+        'camera': "AB-1 Parking",
+        'timestamp': started,
+        'last_seen': started + duration,
+        'duration': duration,
+        'ended': False
+    }
+
+
+def test_violation_key_is_deterministic():
+    assert violation_key("cam", 1, 1000.0) == violation_key("cam", 1, 1000.0)
+    assert violation_key("cam", 1, 1000.0) != violation_key("cam", 2, 1000.0)
+    assert violation_key("cam", 1, 1000.0) != violation_key("other", 1, 1000.0)
+    assert violation_key("cam", 1, 1000.0) != violation_key("cam", 1, 1001.0)
+
+
+def test_upsert_violation_is_idempotent(mock_db):
+    violation = server.ViolationLog(vehicle_id=1, location="AB-1 Parking", duration=5.5).dict()
+
+    async def post_twice():
+        return await server.upsert_violation(dict(violation)), await server.upsert_violation(dict(violation))
+
+    assert asyncio.run(post_twice()) == (True, False)
+    assert asyncio.run(mock_db.violations.count_documents({})) == 1
+
+
+def test_episode_is_inserted_once_then_closed(mock_db, broadcasts):
+    alert = make_alert()
+
+    async def emit():
+        await server.emit_violations([alert], [])
+        await server.emit_violations([alert], [])
+        ended = dict(alert, duration=42.0, last_seen=1042.0, ended=True)
+        await server.emit_violations([], [ended])
+        return await mock_db.violations.find({}, {'_id': 0}).to_list(None)
+
+    documents = asyncio.run(emit())
+    assert len(documents) == 1
+    assert documents[0]['id'] == alert['id']
+    assert documents[0]['duration'] == 42.0
+    assert documents[0]['ended_at'] is not None
+    assert [message['type'] for message in broadcasts] == ['new_violation']
+
+
+def test_reset_alerts_hands_back_live_and_queued_alerts(detection_system):
+    store = detection_system.alert_store
+    store.upsert("cam", 1, [0, 0, 10, 10], 6.0, 100.0)
+    store.upsert("cam", 2, [0, 0, 10, 10], 6.0, 100.0)
+    store.update("cam", set(), {2}, 200.0)
+    assert len(store.pop_expired()) == 1
+    store.upsert("cam", 3, [0, 0, 10, 10], 6.0, 100.0)
+    store.update("cam", set(), {3}, 200.0)
+
+    tracker = detection_system.get_tracker("cam")
+    tracker.tracked_vehicles = [[[0, 0, 10, 10], 1, 100.0, 30.0]]
+
+    drained = detection_system.reset_alerts()
+    assert sorted(alert['vehicle_id'] for alert in drained) == [1, 3]
+    assert all(alert['ended'] for alert in drained)
+    assert store.active("cam") == [] and store.pop_expired() == []
+    assert tracker.tracked_vehicles[0][3] == 0
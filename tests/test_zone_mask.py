@@ -0,0 +1,69 @@
+import numpy as np
+
+from parking_detection import VehicleTracker, ZoneMask
+
+FRAME_SHAPE = (100, 200, 3)
+
+# Bottom half of the frame is a no-parking zone
+BOTTOM_HALF = [[[0.0, 0.5], [1.0, 0.5], [1.0, 1.0], [0.0, 1.0]]]
+
+
+def test_footprint_inside_zone():
+    mask = ZoneMask(BOTTOM_HALF)
+    assert mask.contains([[10, 60, 50, 90]], FRAME_SHAPE).tolist() == [True]
+    assert mask.contains([[10, 5, 50, 40]], FRAME_SHAPE).tolist() == [False]
+
+
+def test_only_the_bottom_footprint_counts():
+    mask = ZoneMask(BOTTOM_HALF, footprint_ratio=0.25)
+    # Mostly above the zone, but the bottom quarter (rows 60-80) lies inside it
+    assert mask.contains([[10, 0, 50, 80]], FRAME_SHAPE).tolist() == [True]
+    # Mostly inside the zone, but the bottom quarter (rows 40-50) lies above it
+    assert mask.contains([[10, 10, 50, 50]], FRAME_SHAPE).tolist() == [False]
+
+
+def test_min_coverage_threshold():
+    # Left half of the bottom half
+    mask = ZoneMask([[[0.0, 0.5], [0.5, 0.5], [0.5, 1.0], [0.0, 1.0]]], min_coverage=0.5)
+    # Footprint spans x 60-160, 40% inside
+    assert mask.contains([[60, 60, 160, 100]], FRAME_SHAPE).tolist() == [False]
+    # Footprint spans x 40-140, 60% inside
+    assert mask.contains([[40, 60, 140, 100]], FRAME_SHAPE).tolist() == [True]
+
+
+def test_boxes_are_clipped_to_the_frame():
+    mask = ZoneMask(BOTTOM_HALF)
+    result = mask.contains([[-50, 80, 30, 150], [180, 60, 400, 95]], FRAME_SHAPE)
+    assert result.tolist() == [True, True]
+
+
+def test_zero_area_and_empty_boxes():
+    mask = ZoneMask(BOTTOM_HALF)
+    assert mask.contains([[20, 60, 20, 90], [20, 90, 60, 90], [300, 60, 350, 90]], FRAME_SHAPE).tolist() == [False, False, False]
+    assert mask.contains([], FRAME_SHAPE).shape == (0,)
+
+
+def test_mask_is_rasterized_once_per_resolution():
+    mask = ZoneMask(BOTTOM_HALF)
+    mask.contains([[10, 60, 50, 90]], FRAME_SHAPE)
+    mask.contains([[10, 60, 50, 90]], FRAME_SHAPE)
+    mask.contains([[10, 60, 50, 90]], (200, 400, 3))
+    assert sorted(mask.integrals) == [(100, 200), (200, 400)]
+    assert mask.integrals[(100, 200)][-1, -1] == 200 * 50
+
+
+def test_empty_frame_resets_timers_in_both_zone_modes():
+    boxes = [[0, 0, 10, 10], [50, 50, 60, 60]]
+    frame_tracker = VehicleTracker()
+    box_tracker = VehicleTracker()
+
+    for t in (0.0, 5.0):
+        frame_tracker.update(boxes, t, True)
+        box_tracker.update(boxes, t, np.array([True, False]))
+    assert [v[3] for v in frame_tracker.tracked_vehicles] == [5.0, 5.0]
+    assert [v[3] for v in box_tracker.tracked_vehicles] == [5.0, 0]
+
+    frame_tracker.update([], 6.0, True)
+    box_tracker.update([], 6.0, np.zeros(0, dtype=bool))
+    assert [v[3] for v in frame_tracker.tracked_vehicles] == [0, 0]
+    assert [v[3] for v in box_tracker.tracked_vehicles] == [0, 0]